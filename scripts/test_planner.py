@@ -5,10 +5,14 @@ import json
 import sys
 import uuid
 from pathlib import Path
-from typing import TextIO
+from typing import TYPE_CHECKING, TextIO
 
 from tourin.server.plan import plan
 
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
 Coordinate = tuple[float, float]
 FEATURE_COLLECTION_TYPE = "FeatureCollection"
 POINT_TYPE = "Point"
@@ -128,7 +132,7 @@ def parse_points_from_geojson(path: Path) -> tuple[Coordinate, list[Coordinate]]
 def build_geojson(
     start: Coordinate,
     destinations: list[Coordinate],
-    path: list[Coordinate],
+    path: npt.NDArray[np.float64],
 ) -> dict:
     """Create a GeoJSON feature collection describing the route."""
     features = [
@@ -152,7 +156,7 @@ def build_geojson(
         {
             "type": "Feature",
             "properties": {"role": "path"},
-            "geometry": {"type": "LineString", "coordinates": path},
+            "geometry": {"type": "LineString", "coordinates": path.tolist()},
         },
     )
 
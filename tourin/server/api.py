@@ -2,21 +2,33 @@
 
 from __future__ import annotations
 
-from typing import Sequence
+from typing import TYPE_CHECKING
 
-from flask import Flask, Response, jsonify, request
+import numpy as np
+import orjson
+from flask import Flask, Response, request
 from werkzeug.exceptions import BadRequest
 
+from tourin.server.graph.index import spatial_index
 from tourin.server.graph.load import load_graph
+from tourin.server.graph.matrix import search_matrix
+from tourin.server.graph.overlay import SnapOverlay
 from tourin.server.graph.snap import snap_coords
-from tourin.server.graph.stitch import stitch_path
+from tourin.server.graph.stitch import cache_edge_coords, stitch_path
 from tourin.server.search.ucs import plan as ucs_plan
 
+if TYPE_CHECKING:
+    import numpy.typing as npt
+
 Coordinate = tuple[float, float]
 
 app = Flask(__name__)
 
 GRAPH = load_graph()
+# Build the shared indexes up front; requests only read them afterwards.
+spatial_index(GRAPH)
+search_matrix(GRAPH)
+cache_edge_coords(GRAPH)
 
 
 def _parse_coordinate(payload: object, label: str) -> Coordinate:
@@ -34,15 +46,40 @@ def _parse_coordinate(payload: object, label: str) -> Coordinate:
     return (float(lon), float(lat))
 
 
-def _parse_destinations(payload: object) -> list[Coordinate]:
+def _parse_destinations(payload: object) -> npt.NDArray[np.float64]:
+    """Validate destinations given as `{'lat', 'lon'}` objects or `[lon, lat]` pairs.
+
+    Returns an `(n, 2)` array of `(lon, lat)` rows.
+    """
     if not isinstance(payload, list) or not payload:
         msg = "destinations must be a non-empty array of coordinates."
         raise BadRequest(msg)
 
-    return [
-        _parse_coordinate(item, f"destinations[{index}]")
-        for index, item in enumerate(payload)
-    ]
+    if isinstance(payload[0], dict):
+        try:
+            payload = [(item["lon"], item["lat"]) for item in payload]
+        except (KeyError, TypeError) as exc:
+            msg = "destinations must all be objects with 'lat' and 'lon'."
+            raise BadRequest(msg) from exc
+
+    try:
+        coords = np.asarray(payload)
+    except ValueError:
+        # Ragged nesting, e.g. pairs of differing lengths.
+        coords = None
+
+    # One dtype check stands in for per-element isinstance checks: strings,
+    # nulls and nested objects all fall outside the numeric kinds.
+    if (
+        coords is None
+        or coords.dtype.kind not in "iuf"
+        or coords.shape != (len(payload), 2)
+        or not np.isfinite(coords).all()
+    ):
+        msg = "destinations must contain finite numeric 'lat' and 'lon' values."
+        raise BadRequest(msg)
+
+    return coords.astype(np.float64, copy=False)
 
 
 @app.after_request
@@ -60,7 +97,10 @@ def route_planner() -> Response:
     if request.method == "OPTIONS":
         return Response("", status=204)
 
-    raw_payload = request.get_json(silent=True)
+    try:
+        raw_payload = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        raw_payload = None
     if raw_payload is None:
         payload: dict[str, object] = {}
     elif isinstance(raw_payload, dict):
@@ -78,10 +118,11 @@ def route_planner() -> Response:
         msg = "Invalid request payload."
         raise BadRequest(msg) from exc
 
-    graph = GRAPH
+    # Request-scoped edits keep the shared graph read-only across requests.
+    graph = SnapOverlay(GRAPH)
 
     try:
-        snapped_nodes = snap_coords(graph, [start, *destinations])
+        snapped_nodes = snap_coords(graph, np.vstack([start, destinations]))
     except ValueError as exc:
         raise BadRequest(str(exc)) from exc
 
@@ -94,13 +135,13 @@ def route_planner() -> Response:
         raise BadRequest(str(exc)) from exc
 
     stitched_path = stitch_path(graph, node_path)
-    return jsonify({"route": _serialize_coordinates(stitched_path)})
-
-
-def _serialize_coordinates(coords: Sequence[Coordinate]) -> list[list[float]]:
-    """Return JSON-serializable [lon, lat] coordinate lists."""
-    return [[lon, lat] for lon, lat in coords]
+    # The (n, 2) array serializes straight to nested [lon, lat] lists.
+    body = orjson.dumps(
+        {"route": stitched_path},
+        option=orjson.OPT_SERIALIZE_NUMPY,
+    )
+    return Response(body, mimetype="application/json")
 
 
 if __name__ == "__main__":  # pragma: no cover
-    app.run()
\ No newline at end of file
+    app.run()
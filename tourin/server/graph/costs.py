@@ -0,0 +1,33 @@
+"""Edge travel costs for searching the routing graph."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Hashable
+
+from tourin.server.graph.stitch import preferred_edge_attrs
+from tourin.server.utils.geo import great_circle_meters
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+    from tourin.server.graph.overlay import SnapOverlay
+
+
+def edge_travel_cost(
+    graph: nx.MultiGraph | SnapOverlay,
+    u: Hashable,
+    v: Hashable,
+) -> float:
+    """Return the travel cost between two adjacent nodes."""
+    candidate = preferred_edge_attrs(graph, u, v)
+    if candidate is None:
+        return float("inf")
+
+    length = candidate.get("length")
+    if length is not None:
+        return float(length)
+
+    # When the edge lacks a precomputed length, approximate using coordinates.
+    u_geo = graph.nodes[u]
+    v_geo = graph.nodes[v]
+    return great_circle_meters(u_geo["y"], u_geo["x"], v_geo["y"], v_geo["x"])
@@ -0,0 +1,119 @@
+"""Spatial index over graph edges, cached for repeated snapping."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Hashable, Sequence
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+
+from tourin.server.utils.geo import great_circle_meters_array
+
+if TYPE_CHECKING:
+    import networkx as nx
+    import numpy.typing as npt
+
+# Graph attribute holding the cached `SpatialIndex`.
+SPATIAL_INDEX_KEY = "_spatial_index"
+
+
+@dataclass(slots=True)
+class SpatialIndex:
+    """Edge STRtree mirroring `ox.distance.nearest_edges` internals.
+
+    No separate node tree is kept: every node ends some edge, so the nearest
+    node is an endpoint of the nearest edge whenever it beats the edge itself.
+    """
+
+    edge_ids: list[tuple[Hashable, Hashable, int]]
+    edge_tree: shapely.STRtree
+
+
+def spatial_index(graph: nx.MultiGraph) -> SpatialIndex:
+    """Return the cached spatial index of `graph`, building it if needed.
+
+    OSMnx rebuilds a GeoDataFrame and an STRtree on every `nearest_edges`
+    call. Building the tree once and keeping it on the graph turns each snap
+    into a single batched tree query. The graph must not be mutated
+    afterwards; snapping records its edits on a `SnapOverlay` instead.
+    """
+    index = graph.graph.get(SPATIAL_INDEX_KEY)
+    if index is None:
+        index = _build_spatial_index(graph)
+        graph.graph[SPATIAL_INDEX_KEY] = index
+    return index
+
+
+def nearest_edges(
+    index: SpatialIndex,
+    lons: Sequence[float],
+    lats: Sequence[float],
+) -> tuple[list[tuple[Hashable, Hashable, int]], npt.NDArray[np.float64]]:
+    """Return the nearest `(u, v, key)` edges and their distances in meters.
+
+    The distance to an edge is the great-circle distance to the point the query
+    projects onto along its geometry, which is where snapping places the
+    synthetic node.
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    points = shapely.points(lons, lats)
+    _, planar_dists = index.edge_tree.query_nearest(
+        points,
+        all_matches=False,
+        return_distance=True,
+    )
+    # A degree of longitude shrinks with latitude, so the planar nearest edge
+    # is not always the nearest on the ground. Every edge that could be closer
+    # in meters lies within this widened radius; rank those candidates instead.
+    radius = planar_dists / np.cos(np.radians(lats))
+    point_pos, edge_pos = index.edge_tree.query(
+        points,
+        predicate="dwithin",
+        distance=radius,
+    )
+
+    lines = index.edge_tree.geometries[edge_pos]
+    offsets = shapely.line_locate_point(lines, points[point_pos])
+    projected = shapely.get_coordinates(shapely.line_interpolate_point(lines, offsets))
+    dists = great_circle_meters_array(
+        lats[point_pos],
+        lons[point_pos],
+        projected[:, 1],
+        projected[:, 0],
+    )
+
+    # Keep the closest candidate of each query point; results are grouped by
+    # point, so sorting by `(point, distance)` puts it first in every group.
+    order = np.lexsort((dists, point_pos))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = point_pos[order][1:] != point_pos[order][:-1]
+    best = order[is_first]
+
+    edge_ids = [index.edge_ids[pos] for pos in edge_pos[best]]
+    return edge_ids, dists[best]
+
+
+def _build_spatial_index(graph: nx.MultiGraph) -> SpatialIndex:
+    """Build the edge STRtree for `graph`."""
+    edge_ids: list[tuple[Hashable, Hashable, int]] = []
+    edge_geoms: list[LineString] = []
+    for u, v, key, data in graph.edges(keys=True, data=True):
+        geometry = data.get("geometry")
+        if geometry is None:
+            geometry = LineString(
+                [
+                    (graph.nodes[u]["x"], graph.nodes[u]["y"]),
+                    (graph.nodes[v]["x"], graph.nodes[v]["y"]),
+                ],
+            )
+        edge_ids.append((u, v, key))
+        edge_geoms.append(geometry)
+    edge_tree = shapely.STRtree(edge_geoms)
+
+    return SpatialIndex(
+        edge_ids=edge_ids,
+        edge_tree=edge_tree,
+    )
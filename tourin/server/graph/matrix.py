@@ -0,0 +1,162 @@
+"""Sparse travel-cost matrix of the routing graph for compiled searches."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Hashable
+
+import numpy as np
+from scipy.sparse import csr_array
+
+from tourin.server.graph.costs import edge_travel_cost
+from tourin.server.graph.overlay import SnapOverlay
+
+if TYPE_CHECKING:
+    import networkx as nx
+    import numpy.typing as npt
+
+# Graph attribute holding the cached `SearchMatrix`.
+SEARCH_MATRIX_KEY = "_search_matrix"
+
+
+@dataclass(slots=True)
+class SearchMatrix:
+    """Travel costs between adjacent nodes, indexed by integer node positions.
+
+    Every adjacent node pair of the base graph owns one slot in
+    `rows`/`cols`/`costs`, so a request overlay only rewrites the slots of the
+    edges it splits before the CSR matrix is rebuilt with NumPy. The `csr`
+    matrix stores both travel directions so searches can run it as a directed
+    graph. `coords` holds each node's `(lon, lat)` by position.
+    """
+
+    node_ids: list[Hashable]
+    positions: dict[Hashable, int]
+    coords: npt.NDArray[np.float64]
+    rows: npt.NDArray[np.int64]
+    cols: npt.NDArray[np.int64]
+    costs: npt.NDArray[np.float64]
+    pair_slots: dict[tuple[Hashable, Hashable], int]
+    csr: csr_array
+
+
+def search_matrix(graph: nx.MultiGraph | SnapOverlay) -> SearchMatrix:
+    """Return the search matrix of `graph` or of an overlay's combined graph.
+
+    The base graph's matrix is built on first use and cached on the graph,
+    which must not be mutated afterwards. An overlay gets a fresh matrix that
+    extends the cached one with its synthetic nodes and edge splits.
+    """
+    if isinstance(graph, SnapOverlay):
+        return _overlay_search_matrix(graph)
+
+    matrix = graph.graph.get(SEARCH_MATRIX_KEY)
+    if matrix is None:
+        matrix = _build_search_matrix(graph)
+        graph.graph[SEARCH_MATRIX_KEY] = matrix
+    return matrix
+
+
+def _build_search_matrix(graph: nx.MultiGraph) -> SearchMatrix:
+    """Resolve the travel cost of every adjacent node pair of `graph`."""
+    node_ids = list(graph)
+    positions = {node: position for position, node in enumerate(node_ids)}
+    pair_slots: dict[tuple[Hashable, Hashable], int] = {}
+    rows: list[int] = []
+    cols: list[int] = []
+    costs: list[float] = []
+    for u, v in graph.edges():
+        if (u, v) in pair_slots:
+            # Parallel edges share one slot holding their cheapest cost.
+            continue
+        pair_slots[u, v] = pair_slots[v, u] = len(costs)
+        rows.append(positions[u])
+        cols.append(positions[v])
+        costs.append(edge_travel_cost(graph, u, v))
+
+    coords = np.array(
+        [(graph.nodes[node]["x"], graph.nodes[node]["y"]) for node in node_ids],
+        dtype=np.float64,
+    )
+    row_array = np.asarray(rows, dtype=np.int64)
+    col_array = np.asarray(cols, dtype=np.int64)
+    cost_array = np.asarray(costs, dtype=np.float64)
+    return SearchMatrix(
+        node_ids=node_ids,
+        positions=positions,
+        coords=coords,
+        rows=row_array,
+        cols=col_array,
+        costs=cost_array,
+        pair_slots=pair_slots,
+        csr=_cost_csr(row_array, col_array, cost_array, len(node_ids)),
+    )
+
+
+def _overlay_search_matrix(overlay: SnapOverlay) -> SearchMatrix:
+    """Extend the base graph's matrix with the edits recorded in `overlay`."""
+    base = search_matrix(overlay.graph)
+    if not overlay.removed_edges and not overlay.extra_edges:
+        return base
+
+    node_ids = [*base.node_ids, *overlay.extra_nodes]
+    positions = base.positions | {
+        node: position
+        for position, node in enumerate(overlay.extra_nodes, len(base.node_ids))
+    }
+
+    extra_coords = [(data["x"], data["y"]) for data in overlay.extra_nodes.values()]
+    coords = np.vstack(
+        [base.coords, np.array(extra_coords, dtype=np.float64).reshape(-1, 2)],
+    )
+
+    costs = base.costs.copy()
+    for u, v, _ in overlay.removed_edges:
+        # Falls back to any remaining parallel edge, or `inf` once none is left.
+        costs[base.pair_slots[u, v]] = edge_travel_cost(overlay, u, v)
+
+    extra_pairs: set[tuple[Hashable, Hashable]] = set()
+    extra_rows: list[int] = []
+    extra_cols: list[int] = []
+    extra_costs: list[float] = []
+    for u, v, _ in overlay.extra_edges:
+        if (u, v) in extra_pairs:
+            # Parallel pieces, e.g. of a split self-loop, share one slot
+            # holding their cheapest cost.
+            continue
+        extra_pairs.update(((u, v), (v, u)))
+        extra_rows.append(positions[u])
+        extra_cols.append(positions[v])
+        extra_costs.append(edge_travel_cost(overlay, u, v))
+
+    rows = np.concatenate([base.rows, np.asarray(extra_rows, dtype=np.int64)])
+    cols = np.concatenate([base.cols, np.asarray(extra_cols, dtype=np.int64)])
+    costs = np.concatenate([costs, np.asarray(extra_costs, dtype=np.float64)])
+    return SearchMatrix(
+        node_ids=node_ids,
+        positions=positions,
+        coords=coords,
+        rows=rows,
+        cols=cols,
+        costs=costs,
+        pair_slots=base.pair_slots,
+        csr=_cost_csr(rows, cols, costs, len(node_ids)),
+    )
+
+
+def _cost_csr(
+    rows: npt.NDArray[np.int64],
+    cols: npt.NDArray[np.int64],
+    costs: npt.NDArray[np.float64],
+    size: int,
+) -> csr_array:
+    """Build the symmetric CSR matrix of the finite-cost node pairs."""
+    present = np.isfinite(costs)
+    rows, cols, costs = rows[present], cols[present], costs[present]
+    return csr_array(
+        (
+            np.concatenate([costs, costs]),
+            (np.concatenate([rows, cols]), np.concatenate([cols, rows])),
+        ),
+        shape=(size, size),
+    )
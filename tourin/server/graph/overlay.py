@@ -0,0 +1,79 @@
+"""Request-scoped graph edits layered over the shared, read-only routing graph."""
+
+from __future__ import annotations
+
+from collections import ChainMap
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Hashable
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+@dataclass(slots=True)
+class SnapOverlay:
+    """Synthetic nodes and edge splits made while serving a single request.
+
+    Snapping records its edits here instead of mutating the shared graph, so
+    the graph and the indexes cached on it stay read-only across concurrent
+    requests. The overlay mirrors the `nodes` mapping and `get_edge_data`
+    lookup of `nx.MultiGraph`, letting cost lookups and path stitching read
+    the combined graph without copying it.
+    """
+
+    graph: nx.MultiGraph
+    extra_nodes: dict[Hashable, dict] = field(default_factory=dict)
+    removed_edges: set[tuple[Hashable, Hashable, int]] = field(default_factory=set)
+    extra_edges: list[tuple[Hashable, Hashable, dict]] = field(default_factory=list)
+    nodes: ChainMap[Hashable, dict] = field(init=False)
+    # `(u, v)` -> removed keys, and `(u, v)` -> `{key: attrs}` of added edges;
+    # both orders share one entry, like a MultiGraph's adjacency.
+    _removed_keys: dict[tuple[Hashable, Hashable], set[int]] = field(
+        init=False,
+        default_factory=dict,
+    )
+    _extra_pairs: dict[tuple[Hashable, Hashable], dict[int, dict]] = field(
+        init=False,
+        default_factory=dict,
+    )
+
+    def __post_init__(self) -> None:
+        """Expose overlay nodes ahead of the base graph's nodes."""
+        self.nodes = ChainMap(self.extra_nodes, self.graph.nodes)
+
+    def add_node(self, node: Hashable, **attrs: object) -> None:
+        """Add a synthetic node visible only through this overlay."""
+        self.extra_nodes[node] = attrs
+
+    def remove_edge(self, u: Hashable, v: Hashable, key: int) -> None:
+        """Hide the base graph edge `(u, v, key)`."""
+        self.removed_edges.add((u, v, key))
+        self._removed_keys.setdefault((u, v), set()).add(key)
+        self._removed_keys.setdefault((v, u), set()).add(key)
+
+    def add_edge(self, u: Hashable, v: Hashable, **attrs: object) -> None:
+        """Add an edge touching at least one synthetic node.
+
+        Splitting a self-loop adds two parallel edges between the same nodes;
+        each keeps its own key.
+        """
+        self.extra_edges.append((u, v, attrs))
+        edges = self._extra_pairs.get((u, v))
+        if edges is None:
+            edges = self._extra_pairs[u, v] = self._extra_pairs[v, u] = {}
+        edges[len(edges)] = attrs
+
+    def get_edge_data(self, u: Hashable, v: Hashable) -> dict[int, dict] | None:
+        """Return the `key -> attrs` edges between `u` and `v`, or `None`."""
+        # Added edges always touch a synthetic node, so no base edge shares
+        # their node pair.
+        extra = self._extra_pairs.get((u, v))
+        if extra is not None:
+            return extra
+
+        edges = self.graph.get_edge_data(u, v)
+        removed = self._removed_keys.get((u, v))
+        if edges is None or not removed:
+            return edges
+        kept = {key: data for key, data in edges.items() if key not in removed}
+        return kept or None
@@ -8,21 +8,25 @@ from typing import TYPE_CHECKING, Hashable, Literal, Sequence
 from uuid import uuid4
 
 import numpy as np
-import osmnx as ox
-from shapely.geometry import LineString, MultiLineString, Point
-from shapely.ops import linemerge, substring
-
-from tourin.server.utils.geo import Coordinate, great_circle_meters
+import shapely
+from shapely.geometry import LineString, MultiLineString
+from shapely.ops import linemerge
+
+from tourin.server.graph.index import nearest_edges, spatial_index
+from tourin.server.graph.stitch import EDGE_COORDS_KEY, squared_distance
+from tourin.server.utils.geo import (
+    Coordinate,
+    great_circle_meters,
+    great_circle_meters_array,
+    segment_lengths_meters,
+)
 
 if TYPE_CHECKING:
     import networkx as nx
+    import numpy.typing as npt
+
+    from tourin.server.graph.overlay import SnapOverlay
 
-# (u, v, key) triple length used by NetworkX MultiGraphs.
-EDGE_TUPLE_SIZE = 3
-# When splitting an edge by a perpendicular projection we expect two segments.
-EXPECTED_SEGMENT_COUNT = 2
-# Minimum coordinate count required for a valid LineString segment.
-MIN_LINESTRING_COORDS = 2
 # Default maximum snapping distance in meters.
 SNAP_MAX_DISTANCE_M = 100.0
 
@@ -39,18 +43,21 @@ class SnapResult:
 
 
 def snap_coords(
-    graph: nx.MultiGraph,
-    coords: Sequence[Coordinate],
+    overlay: SnapOverlay,
+    coords: Sequence[Coordinate] | npt.NDArray[np.float64],
     max_distance_m: float | None = SNAP_MAX_DISTANCE_M,
 ) -> list[SnapResult]:
     """Snap (lon, lat) coordinates onto graph nodes or edges.
 
     Parameters
     ----------
-    graph:
-        The working OSMnx/NetworkX graph rendered undirected via `setup_graph`.
+    overlay:
+        The request's overlay over the shared graph loaded via `load_graph`.
+        Synthetic nodes and edge splits are recorded on it, leaving the
+        graph itself untouched.
     coords:
-        Sequence of `(lon, lat)` coordinate pairs to snap.
+        Sequence of `(lon, lat)` coordinate pairs, or an `(n, 2)` array of
+        them, to snap.
     max_distance_m:
         Maximum allowed snapping distance (meters). Coordinates farther than
         this distance from any graph element raise ``ValueError``. Set to
@@ -65,41 +72,34 @@ def snap_coords(
     -----
     Any coordinate that falls closer to an edge than an existing node triggers
     a synthetic node insertion along that edge so subsequent routing algorithms
-    can operate purely on graph nodes.
+    can operate purely on graph nodes. Snap all of a request's coordinates in
+    one call; a second call on the same overlay does not see the first call's
+    splits.
 
     """
-    if not coords:
+    lon_lat = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    if not len(lon_lat):
         return []
+    # Per-coordinate bookkeeping below runs on plain Python floats.
+    coords = list(map(tuple, lon_lat.tolist()))
 
-    # Collect candidate nodes/edges in a single batch for performance.
-    lons, lats = zip(*coords)
-    node_ids_raw, node_dists_raw = ox.distance.nearest_nodes(
-        graph,
-        X=lons,
-        Y=lats,
-        return_dist=True,
-    )
-    edge_ids_raw, edge_dists_raw = ox.distance.nearest_edges(
-        graph,
-        X=lons,
-        Y=lats,
-        return_dist=True,
-    )
-
-    node_ids = _ensure_list(node_ids_raw)
-    node_dists = _ensure_list(node_dists_raw)
-    edge_ids = _ensure_edge_list(edge_ids_raw)
-    edge_dists = _ensure_list(edge_dists_raw)
+    # Collect candidate edges in a single batch, then pick nodes among their ends.
+    graph = overlay.graph
+    lons, lats = lon_lat[:, 0], lon_lat[:, 1]
+    edge_ids, edge_dists = nearest_edges(spatial_index(graph), lons, lats)
+    node_ids, node_dists = _nearest_endpoints(graph, edge_ids, lons, lats)
 
-    snapped: list[SnapResult] = []
+    snapped_ids: list[Hashable] = []
+    methods: list[Literal["node", "edge"]] = []
+    # Edge snaps are applied once every lookup is done, grouped per edge, so
+    # several coordinates landing on the same edge split it in a single pass.
+    edge_snaps: dict[tuple[Hashable, Hashable, int], list[int]] = {}
 
     for idx, (lon, lat) in enumerate(coords):
-        node_id = node_ids[idx]
         node_dist = node_dists[idx]
-        edge_tuple = edge_ids[idx]
         edge_dist = edge_dists[idx]
 
-        nearest_distance = node_dist if edge_dist is None else min(node_dist, edge_dist)
+        nearest_distance = min(node_dist, edge_dist)
         if max_distance_m is not None and nearest_distance > max_distance_m:
             msg = (
                 "Coordinate is too far from the routing graph: "
@@ -107,18 +107,22 @@ def snap_coords(
             )
             raise ValueError(msg)
 
-        if edge_dist is None or node_dist <= edge_dist:
-            snapped_node_id = node_id
-            method: Literal["node", "edge"] = "node"
+        snapped_ids.append(node_ids[idx])
+        if node_dist <= edge_dist:
+            methods.append("node")
         else:
-            snapped_node_id = _insert_synthetic_node(
-                graph,
-                edge_tuple,
-                Point(lon, lat),
-            )
-            method = "edge"
+            methods.append("edge")
+            edge_snaps.setdefault(edge_ids[idx], []).append(idx)
 
-        node_data = graph.nodes[snapped_node_id]
+    for edge, indices in edge_snaps.items():
+        new_ids = _insert_synthetic_nodes(overlay, edge, lon_lat[indices])
+        for idx, node_id in zip(indices, new_ids):
+            snapped_ids[idx] = node_id
+
+    snapped: list[SnapResult] = []
+
+    for (lon, lat), snapped_node_id, method in zip(coords, snapped_ids, methods):
+        node_data = overlay.nodes[snapped_node_id]
         snapped_lat = node_data["y"]
         snapped_lon = node_data["x"]
         distance = great_circle_meters(lat, lon, snapped_lat, snapped_lon)
@@ -136,88 +140,97 @@ def snap_coords(
     return snapped
 
 
-def _ensure_list(value: object) -> list:
-    """Return a plain list regardless of whether `value` is scalar/tuple/array."""
-    if isinstance(value, np.ndarray):
-        return value.tolist()
-    if isinstance(value, (list, tuple)):
-        return list(value)
-    return [value]
-
-
-def _ensure_edge_list(
-    value: object,
-) -> list[tuple[Hashable, Hashable, int]]:
-    """Normalize the varied return shapes from `ox.distance.nearest_edges`."""
-    if isinstance(value, np.ndarray):
-        flattened = value.tolist()
-        if not isinstance(flattened, (list, tuple)):
-            flattened = [flattened]
-        # When the array represents a single edge, `tolist` returns a flat list
-        # of scalars (e.g., [u, v, key]). Wrap it so callers can index per edge.
-        if isinstance(flattened, list) and flattened:
-            first = flattened[0]
-            if not isinstance(first, (list, tuple, np.ndarray)):
-                return [tuple(flattened)]  # type: ignore[list-item]
-        if isinstance(flattened, tuple) and len(flattened) == EDGE_TUPLE_SIZE:
-            return [flattened]
-        return [
-            tuple(item) if isinstance(item, (list, tuple, np.ndarray)) else (item,)
-            for item in flattened
-        ]
-    if isinstance(value, tuple) and len(value) == EDGE_TUPLE_SIZE:
-        return [value]
-    return [tuple(edge) for edge in value]  # type: ignore[arg-type]
-
-
-def _insert_synthetic_node(
+def _nearest_endpoints(
     graph: nx.MultiGraph,
+    edges: Sequence[tuple[Hashable, Hashable, int]],
+    lons: Sequence[float],
+    lats: Sequence[float],
+) -> tuple[list[Hashable], npt.NDArray[np.float64]]:
+    """Return the closer endpoint of each edge and its distance in meters."""
+    nodes = graph.nodes
+    u_coords = np.array([(nodes[u]["x"], nodes[u]["y"]) for u, _, _ in edges])
+    v_coords = np.array([(nodes[v]["x"], nodes[v]["y"]) for _, v, _ in edges])
+    dist_to_u = great_circle_meters_array(lats, lons, u_coords[:, 1], u_coords[:, 0])
+    dist_to_v = great_circle_meters_array(lats, lons, v_coords[:, 1], v_coords[:, 0])
+
+    use_u = dist_to_u <= dist_to_v
+    node_ids = [u if pick_u else v for (u, v, _), pick_u in zip(edges, use_u)]
+    return node_ids, np.where(use_u, dist_to_u, dist_to_v)
+
+
+def _insert_synthetic_nodes(
+    overlay: SnapOverlay,
     edge: tuple[Hashable, Hashable, int],
-    target_point: Point,
-) -> Hashable:
-    """Split an edge and insert a synthetic node nearest to `target_point`."""
+    target_points: npt.NDArray[np.float64],
+) -> list[Hashable]:
+    """Split an edge once at the projections of every `(lon, lat)` row.
+
+    Returns the node each point snapped to. Points projecting onto the same
+    spot share one synthetic node, while points projecting onto either end of
+    the edge reuse the closer endpoint.
+    """
+    graph = overlay.graph
     u, v, key = edge
     edge_attrs = dict(graph[u][v][key])
-    line = _edge_geometry(graph, u, v, edge_attrs)
-    projected_point, distance_along = _project_point(line, target_point)
-
-    segment_list = _split_line_segments(line, distance_along)
-    if len(segment_list) != EXPECTED_SEGMENT_COUNT:
-        # Degenerate case: fallback to whichever endpoint is closer.
-        dist_to_u = projected_point.distance(
-            Point(graph.nodes[u]["x"], graph.nodes[u]["y"]),
-        )
-        dist_to_v = projected_point.distance(
-            Point(graph.nodes[v]["x"], graph.nodes[v]["y"]),
+    # Cached stitching coordinates belong to the geometry being replaced.
+    edge_attrs.pop(EDGE_COORDS_KEY, None)
+    line_coords = shapely.get_coordinates(_edge_geometry(graph, u, v, edge_attrs))
+    offsets = _vertex_offsets(line_coords)
+    projected, distances_along = _project_points(line_coords, offsets, target_points)
+    projections = list(zip(map(tuple, projected.tolist()), distances_along.tolist()))
+
+    cut_points = {distance_along: point for point, distance_along in projections}
+    distances = sorted(d for d in cut_points if 0 < d < offsets[-1])
+    if not distances:
+        # Every point projects onto an end of the edge: reuse the closer endpoint.
+        return [_closest_endpoint(graph, u, v, point) for point, _ in projections]
+
+    cut_nodes: dict[float, Hashable] = {}
+    for distance_along in distances:
+        x, y = cut_points[distance_along]
+        new_node_id = f"snap-{uuid4().hex}"
+        # Store longitude/latitude for compatibility with OSMnx helper functions.
+        overlay.add_node(new_node_id, x=x, y=y, lon=x, lat=y, synthetic=True)
+        cut_nodes[distance_along] = new_node_id
+
+    overlay.remove_edge(u, v, key)
+
+    segments = [
+        LineString(piece)
+        for piece in _split_polyline(
+            line_coords,
+            offsets,
+            distances,
+            [cut_points[d] for d in distances],
         )
-        return u if dist_to_u <= dist_to_v else v
-
-    first, second = _orient_segments(segment_list, graph, u, v)
-
-    new_node_id = f"snap-{uuid4().hex}"
-    # Store longitude/latitude for compatibility with OSMnx helper functions.
-    graph.add_node(
-        new_node_id,
-        x=projected_point.x,
-        y=projected_point.y,
-        lon=projected_point.x,
-        lat=projected_point.y,
-        synthetic=True,
-    )
-
-    graph.remove_edge(u, v, key)
-
-    first_attrs = edge_attrs.copy()
-    first_attrs["geometry"] = first
-    first_attrs["length"] = _linestring_length(first)
-    graph.add_edge(u, new_node_id, **first_attrs)
-
-    second_attrs = edge_attrs.copy()
-    second_attrs["geometry"] = second
-    second_attrs["length"] = _linestring_length(second)
-    graph.add_edge(new_node_id, v, **second_attrs)
-
-    return new_node_id
+    ]
+    # Walk the fragments in line order, which may run from `v` back to `u`.
+    forward = _runs_from(line_coords, graph.nodes[u])
+    line_start, line_end = (u, v) if forward else (v, u)
+    chain = [line_start, *(cut_nodes[d] for d in distances), line_end]
+    lengths = _piece_lengths(line_coords, offsets, distances)
+    for (a, b), segment, length in zip(pairwise(chain), segments, lengths):
+        segment_attrs = edge_attrs.copy()
+        segment_attrs["geometry"] = segment
+        segment_attrs["length"] = length
+        overlay.add_edge(a, b, **segment_attrs)
+
+    return [
+        cut_nodes.get(distance_along) or _closest_endpoint(graph, u, v, point)
+        for point, distance_along in projections
+    ]
+
+
+def _closest_endpoint(
+    graph: nx.MultiGraph,
+    u: Hashable,
+    v: Hashable,
+    point: Coordinate,
+) -> Hashable:
+    """Return whichever of the edge endpoints `u`/`v` lies closer to `point`."""
+    dist_to_u = squared_distance(point, (graph.nodes[u]["x"], graph.nodes[u]["y"]))
+    dist_to_v = squared_distance(point, (graph.nodes[v]["x"], graph.nodes[v]["y"]))
+    return u if dist_to_u <= dist_to_v else v
 
 
 def _edge_geometry(
@@ -239,53 +252,89 @@ def _edge_geometry(
     return LineString([start, end])
 
 
-def _project_point(line: LineString, point: Point) -> tuple[Point, float]:
-    """Project `point` onto `line` and return the closest point and distance."""
-    distance_along = line.project(point)
-    projected_point = line.interpolate(distance_along)
-    return projected_point, distance_along
+def _vertex_offsets(coords: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Return the planar distance along a polyline of each of its vertices."""
+    steps = np.hypot(*np.diff(coords, axis=0).T)
+    return np.concatenate([[0.0], np.cumsum(steps)])
 
 
-def _split_line_segments(line: LineString, split_distance: float) -> list[LineString]:
-    """Return line fragments obtained by cutting `line` at `split_distance`."""
-    line_length = line.length
-    if line_length == 0 or split_distance <= 0 or split_distance >= line_length:
-        return []
+def _project_points(
+    coords: npt.NDArray[np.float64],
+    offsets: npt.NDArray[np.float64],
+    points: npt.NDArray[np.float64],
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Project `(k, 2)` points onto a polyline in one vectorized pass.
+
+    Mirrors `LineString.project`/`interpolate`: returns the closest point on the
+    polyline for each input and its planar distance along the polyline.
+    """
+    starts = coords[:-1]
+    deltas = np.diff(coords, axis=0)
+    seg_sq = np.einsum("ij,ij->i", deltas, deltas)
+    # (k, segments) position of each point's foot along every segment.
+    rel = points[:, None, :] - starts[None, :, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.einsum("ksj,sj->ks", rel, deltas) / seg_sq
+    # Zero-length segments project onto their start.
+    t = np.clip(np.nan_to_num(t, nan=0.0), 0.0, 1.0)
+    feet = starts + t[..., None] * deltas
+    nearest = np.argmin(((feet - points[:, None, :]) ** 2).sum(axis=2), axis=1)
+
+    rows = np.arange(len(points))
+    distances_along = offsets[nearest] + t[rows, nearest] * (
+        offsets[nearest + 1] - offsets[nearest]
+    )
+    return feet[rows, nearest], distances_along
 
-    first = substring(line, 0, split_distance)
-    second = substring(line, split_distance, line_length)
 
-    segments: list[LineString] = []
-    for segment in (first, second):
-        if isinstance(segment, LineString) and not segment.is_empty:
-            coords = list(segment.coords)
-            if len(coords) >= MIN_LINESTRING_COORDS:
-                segments.append(segment)
-    return segments
+def _split_polyline(
+    coords: npt.NDArray[np.float64],
+    offsets: npt.NDArray[np.float64],
+    split_distances: Sequence[float],
+    split_points: Sequence[Coordinate],
+) -> list[npt.NDArray[np.float64]]:
+    """Cut a polyline into pieces at sorted interior distances along it.
 
+    `split_points` holds the coordinates at each distance, so every cut shares
+    its exact end and start point with the synthetic node placed there.
+    """
+    starts = [coords[0], *split_points]
+    ends = [*split_points, coords[-1]]
+    # Each piece keeps the original vertices lying strictly between its cuts.
+    first = np.concatenate([[1], np.searchsorted(offsets, split_distances, "right")])
+    last = np.concatenate(
+        [np.searchsorted(offsets, split_distances, "left"), [len(coords) - 1]],
+    )
+    return [
+        np.vstack([start, coords[lo:hi], end])
+        for start, lo, hi, end in zip(starts, first, last, ends)
+    ]
 
-def _linestring_length(line: LineString) -> float:
-    """Compute the great-circle length of a line storing lon/lat coordinates."""
-    coords = list(line.coords)
-    total = 0.0
-    for (x1, y1), (x2, y2) in pairwise(coords):
-        total += great_circle_meters(y1, x1, y2, x2)
-    return total
 
+def _piece_lengths(
+    coords: npt.NDArray[np.float64],
+    offsets: npt.NDArray[np.float64],
+    split_distances: Sequence[float],
+) -> list[float]:
+    """Return the great-circle length of each piece cut at sorted distances.
 
-def _orient_segments(
-    segments: list[LineString],
-    graph: nx.MultiGraph,
-    u: Hashable,
-    v: Hashable,
-) -> tuple[LineString, LineString]:
-    """Order edge fragments so they connect `u -> new_node -> v`."""
-    u_point = Point(graph.nodes[u]["x"], graph.nodes[u]["y"])
-    v_point = Point(graph.nodes[v]["x"], graph.nodes[v]["y"])
-
-    first = min(segments, key=lambda seg: seg.distance(u_point))
-    second = min(segments, key=lambda seg: seg.distance(v_point))
-    if first == second:
-        # Fall back to original ordering if both mins refer to the same segment.
-        first, second = segments[:EXPECTED_SEGMENT_COUNT]
-    return first, second
+    One cumulative haversine pass over the parent polyline serves every piece;
+    a cut inside a segment takes the matching fraction of that segment.
+    """
+    steps = segment_lengths_meters(coords)
+    arc_offsets = np.concatenate([[0.0], np.cumsum(steps)])
+    # Segment holding each cut; interior cuts never sit past the last vertex.
+    segment = np.searchsorted(offsets, split_distances, "right") - 1
+    fraction = (split_distances - offsets[segment]) / (
+        offsets[segment + 1] - offsets[segment]
+    )
+    cut_offsets = arc_offsets[segment] + fraction * steps[segment]
+    return np.diff([0.0, *cut_offsets, arc_offsets[-1]]).tolist()
+
+
+def _runs_from(coords: npt.NDArray[np.float64], node: dict) -> bool:
+    """Return whether a polyline starts at, rather than ends at, `node`."""
+    start = (node["x"], node["y"])
+    first, last = coords[0].tolist(), coords[-1].tolist()
+    # Ties keep the original line order, as in `stitch._oriented_coords`.
+    return squared_distance(first, start) <= squared_distance(last, start)
@@ -5,52 +5,101 @@ from __future__ import annotations
 from itertools import pairwise
 from typing import TYPE_CHECKING, Hashable, Sequence
 
+import numpy as np
+import shapely
+
 if TYPE_CHECKING:
     import networkx as nx
+    import numpy.typing as npt
 
+    from tourin.server.graph.overlay import SnapOverlay
     from tourin.server.utils.geo import Coordinate
 
+# Edge attribute holding `(geometry, from_node, coords)`, see `cache_edge_coords`.
+EDGE_COORDS_KEY = "_coords"
+
 
 def stitch_path(
-    graph: nx.MultiGraph,
+    graph: nx.MultiGraph | SnapOverlay,
     nodes: Sequence[Hashable],
-) -> list[Coordinate]:
-    """Expand a node path into full geometry-aware coordinates."""
+) -> npt.NDArray[np.float64]:
+    """Expand a node path into full geometry-aware coordinates.
+
+    Returns an `(n, 2)` array of `(lon, lat)` rows.
+    """
     if not nodes:
-        return []
+        return np.empty((0, 2), dtype=np.float64)
 
-    stitched: list[Coordinate] = [
-        (graph.nodes[nodes[0]]["x"], graph.nodes[nodes[0]]["y"]),
-    ]
+    first = graph.nodes[nodes[0]]
+    parts = [np.array([[first["x"], first["y"]]], dtype=np.float64)]
 
     for u, v in pairwise(nodes):
         segment = edge_geometry_coords(graph, u, v)
         # Skip the first coordinate to avoid duplicates.
-        stitched.extend(segment[1:])
+        parts.append(segment[1:])
+
+    return np.concatenate(parts)
 
-    return stitched
+
+def cache_edge_coords(graph: nx.MultiGraph) -> None:
+    """Precompute the oriented coordinates of every edge of `graph`.
+
+    Run once after loading the shared graph, before it serves requests. The
+    coordinates are stored on each edge's attribute dict, oriented from the
+    edge's `u` node, and reused by `edge_geometry_coords` for both travel
+    directions.
+    """
+    for u, v, data in graph.edges(data=True):
+        geometry = data.get("geometry")
+        coords = _oriented_coords(graph, u, v, geometry)
+        # Callers receive views of the cached array; keep them from editing it.
+        coords.flags.writeable = False
+        data[EDGE_COORDS_KEY] = (geometry, u, coords)
 
 
 def edge_geometry_coords(
-    graph: nx.MultiGraph,
+    graph: nx.MultiGraph | SnapOverlay,
     u: Hashable,
     v: Hashable,
-) -> list[Coordinate]:
-    """Return the geometry coordinates between adjacent nodes."""
+) -> npt.NDArray[np.float64]:
+    """Return the read-only `(n, 2)` geometry coordinates between adjacent nodes.
+
+    Uses the coordinates precomputed by `cache_edge_coords` when present and
+    otherwise derives them without storing anything, so the shared graph is
+    never written to while serving requests. The cache is keyed on the
+    geometry object, so edges rebuilt with a new geometry never see stale
+    coordinates.
+    """
     candidate = preferred_edge_attrs(graph, u, v)
+    if candidate is None:
+        return _oriented_coords(graph, u, v, None)
+
+    geometry = candidate.get("geometry")
+    cached = candidate.get(EDGE_COORDS_KEY)
+    if cached is None or cached[0] is not geometry:
+        return _oriented_coords(graph, u, v, geometry)
+
+    _, from_node, coords = cached
+    return coords if from_node == u else coords[::-1]
+
+
+def _oriented_coords(
+    graph: nx.MultiGraph | SnapOverlay,
+    u: Hashable,
+    v: Hashable,
+    geometry: object,
+) -> npt.NDArray[np.float64]:
+    """Return fresh edge coordinates running from node `u` to node `v`."""
     start = (graph.nodes[u]["x"], graph.nodes[u]["y"])
     end = (graph.nodes[v]["x"], graph.nodes[v]["y"])
 
-    if candidate is None:
-        return [start, end]
-
-    coords = extract_geometry_coords(candidate.get("geometry"))
-    if not coords:
-        return [start, end]
+    coords = extract_geometry_coords(geometry)
+    if coords is None:
+        return np.array([start, end], dtype=np.float64)
 
     # Ensure polyline runs from node `u` to node `v` and touches their exact coordinates.  # noqa: E501
     if squared_distance(coords[0], start) > squared_distance(coords[-1], start):
-        coords = list(reversed(coords))
+        coords = coords[::-1]
 
     coords[0] = start
     coords[-1] = end
@@ -58,7 +107,7 @@ def edge_geometry_coords(
 
 
 def preferred_edge_attrs(
-    graph: nx.MultiGraph,
+    graph: nx.MultiGraph | SnapOverlay,
     u: Hashable,
     v: Hashable,
 ) -> dict | None:
@@ -72,21 +121,18 @@ def preferred_edge_attrs(
     )
 
 
-def extract_geometry_coords(geometry: object) -> list[Coordinate] | None:
-    """Return a mutable list of coordinates for the provided geometry."""
+def extract_geometry_coords(geometry: object) -> npt.NDArray[np.float64] | None:
+    """Return a fresh `(n, 2)` coordinate array for the provided geometry."""
     if geometry is None:
         return None
-    if hasattr(geometry, "coords"):
-        return list(geometry.coords)  # type: ignore[return-value]
-    if hasattr(geometry, "geoms"):
-        coords: list[Coordinate] = []
-        for geom in geometry.geoms:  # type: ignore[attr-defined]
-            if hasattr(geom, "coords"):
-                coords.extend(list(geom.coords))  # type: ignore[arg-type]
-        return coords or None
-    if isinstance(geometry, (list, tuple)):
-        return list(geometry)
-    return None
+    if isinstance(geometry, shapely.Geometry):
+        # Multi-part geometries are flattened part by part, in order.
+        coords = shapely.get_coordinates(geometry)
+    elif isinstance(geometry, (list, tuple)):
+        coords = np.array(geometry, dtype=np.float64).reshape(-1, 2)
+    else:
+        return None
+    return coords if len(coords) else None
 
 
 def squared_distance(a: Coordinate, b: Coordinate) -> float:
@@ -5,22 +5,27 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Sequence
 
 from tourin.server.graph.load import load_graph
+from tourin.server.graph.overlay import SnapOverlay
 from tourin.server.graph.snap import snap_coords
 
 from .graph.stitch import stitch_path
 from .search.ucs import plan as ucs_plan
 
 if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
     from tourin.server.utils.geo import Coordinate
 
 
 def plan(
     start: Coordinate,
     destinations: Sequence[Coordinate],
-) -> list[Coordinate]:
+) -> npt.NDArray[np.float64]:
     """Build a LineString route starting at `start` and visiting destinations.
 
-    All coordinates use `(lon, lat)` ordering.
+    All coordinates use `(lon, lat)` ordering; the route is returned as an
+    `(n, 2)` array.
 
     Parameters
     ----------
@@ -30,7 +35,7 @@ def plan(
         Sequence of `(lon, lat)` coordinates to visit.
 
     """
-    graph = load_graph()
+    graph = SnapOverlay(load_graph())
 
     snapped_nodes = snap_coords(graph, [start, *destinations])
     start_node = snapped_nodes[0].node_id
@@ -3,14 +3,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from heapq import heappop, heappush
 from typing import TYPE_CHECKING, Hashable, Iterable, Sequence
 
-from tourin.server.graph.stitch import preferred_edge_attrs
-from tourin.server.utils.geo import great_circle_meters
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from tourin.server.graph.matrix import SearchMatrix, search_matrix
+from tourin.server.utils.geo import great_circle_meters_array
 
 if TYPE_CHECKING:
     import networkx as nx
+    import numpy.typing as npt
+
+    from tourin.server.graph.overlay import SnapOverlay
+
+# About 4% of random reachable node pairs of the shipped graph have a road
+# distance above this multiple of their straight-line distance.
+SEARCH_DETOUR_FACTOR = 2.0
 
 
 @dataclass(slots=True)
@@ -23,80 +32,108 @@ class UCSResult:
 
 
 def plan(
-    graph: nx.MultiGraph,
+    graph: nx.MultiGraph | SnapOverlay,
     start_node: Hashable,
     target_nodes: Sequence[Hashable],
 ) -> list[Hashable]:
-    """Plan the node sequence that visits all destinations via UCS."""
+    """Plan the node sequence that visits all destinations via UCS.
+
+    Pass the request's `SnapOverlay` as `graph` when the start or targets
+    include synthetic nodes.
+    """
     if not target_nodes:
         msg = "At least one destination coordinate is required."
         raise ValueError(msg)
 
-    pending_targets = {*target_nodes}
+    # Ordered and unique; a destination snapped onto the start is already
+    # visited, so it needs no zero-length search of its own.
+    pending_targets = dict.fromkeys(t for t in target_nodes if t != start_node)
 
     # Track the accumulated node path; reuse junction nodes only once.
     full_path: list[Hashable] = [start_node]
     current_node = start_node
+    matrix = search_matrix(graph)
+    # Only a single-destination trip is bounded; with several targets a missed
+    # bound would often repeat the nearest-target search unbounded.
+    bounded = len(pending_targets) == 1
 
     while pending_targets:
-        result = _ucs(graph, current_node, pending_targets)
+        result = _ucs(matrix, current_node, pending_targets, bounded=bounded)
         if result is None:
             msg = "No route found for remaining destinations."
             raise RuntimeError(msg)
         _, path = result.target, result.path
         full_path.extend(path[1:])  # avoid duplicating junction node
-        pending_targets.remove(result.target)
+        del pending_targets[result.target]
         current_node = result.target
 
     return full_path
 
 
 def _ucs(
-    graph: nx.MultiGraph,
+    matrix: SearchMatrix,
     source: Hashable,
     targets: Iterable[Hashable],
+    *,
+    bounded: bool = False,
 ) -> UCSResult | None:
-    """Run UCS until the closest target node is reached."""
-    target_set = set(targets)
-    frontier: list[tuple[float, Hashable, list[Hashable]]] = [
-        (0.0, source, [source]),
-    ]
-    # best_cost caches the cheapest known cost to each node to avoid rework.
-    best_cost = {source: 0.0}
-
-    while frontier:
-        cost, node, path = heappop(frontier)
-        if node in target_set:
-            return UCSResult(target=node, path=path, cost=cost)
-
-        if cost > best_cost.get(node, float("inf")):
-            continue
-
-        for neighbor in graph.neighbors(node):
-            step_cost = _edge_travel_cost(graph, node, neighbor)
-            new_cost = cost + step_cost
-            if new_cost < best_cost.get(neighbor, float("inf")):
-                best_cost[neighbor] = new_cost
-                heappush(frontier, (new_cost, neighbor, [*path, neighbor]))
+    """Run UCS from `source` and return the closest target node.
+
+    The search itself is SciPy's compiled Dijkstra (uniform cost search over
+    non-negative costs) on the CSR travel-cost matrix. When `bounded`, it
+    first stops at `SEARCH_DETOUR_FACTOR` times the straight-line distance to
+    the nearest target, which keeps short trips from settling the whole graph.
+    """
+    target_ids = list(targets)
+    target_positions = [matrix.positions[target] for target in target_ids]
+    source_position = matrix.positions[source]
+
+    limits = [np.inf]
+    if bounded:
+        lon, lat = matrix.coords[source_position]
+        target_coords = matrix.coords[target_positions]
+        straight_line = great_circle_meters_array(
+            lat,
+            lon,
+            target_coords[:, 1],
+            target_coords[:, 0],
+        ).min()
+        limits.insert(0, SEARCH_DETOUR_FACTOR * straight_line)
+
+    # Costs within `limit` are exact, so when any target is reached the closest
+    # one is among them; only a miss needs the unbounded search.
+    for limit in limits:
+        costs, predecessors = dijkstra(
+            matrix.csr,
+            indices=source_position,
+            return_predecessors=True,
+            limit=limit,
+        )
+        target_costs = costs[target_positions]
+        # Ties go to the earliest pending target.
+        closest = int(np.argmin(target_costs))
+        if np.isfinite(target_costs[closest]):
+            return UCSResult(
+                target=target_ids[closest],
+                path=_backtrack(
+                    matrix.node_ids,
+                    predecessors,
+                    target_positions[closest],
+                ),
+                cost=float(target_costs[closest]),
+            )
 
     return None
 
 
-def _edge_travel_cost(
-    graph: nx.MultiGraph,
-    u: Hashable,
-    v: Hashable,
-) -> float:
-    """Return the travel cost between two adjacent nodes."""
-    candidate = preferred_edge_attrs(graph, u, v)
-    if candidate is None:
-        return float("inf")
-
-    length = candidate.get("length")
-    if length is not None:
-        return float(length)
-
-    # When the edge lacks a precomputed length, approximate using coordinates.
-    u_geo = graph.nodes[u]
-    v_geo = graph.nodes[v]
-    return great_circle_meters(u_geo["y"], u_geo["x"], v_geo["y"], v_geo["x"])
+def _backtrack(
+    node_ids: list[Hashable],
+    predecessors: npt.NDArray[np.int32],
+    target: int,
+) -> list[Hashable]:
+    """Rebuild the `source -> target` node path from predecessor positions."""
+    path = [target]
+    # SciPy marks the search source with a negative predecessor.
+    while (parent := predecessors[path[-1]]) >= 0:
+        path.append(parent)
+    return [node_ids[position] for position in reversed(path)]
@@ -2,15 +2,16 @@
 
 from __future__ import annotations
 
-import osmnx as ox
+import math
+from typing import TYPE_CHECKING
 
-_GREAT_CIRCLE = getattr(ox.distance, "great_circle", None)
-if _GREAT_CIRCLE is None:
-    try:
-        _GREAT_CIRCLE = ox.distance.great_circle_vec
-    except AttributeError as exc:  # pragma: no cover - legacy fallback guard
-        msg = "OSMnx distance helpers lack both `great_circle` and `great_circle_vec`."
-        raise AttributeError(msg) from exc
+import numpy as np
+
+if TYPE_CHECKING:
+    import numpy.typing as npt
+
+# Mean Earth radius in meters, matching `osmnx.distance.EARTH_RADIUS_M`.
+EARTH_RADIUS_M = 6_371_009
 
 
 Coordinate = tuple[float, float]  # (lon, lat)
@@ -23,4 +24,48 @@ def great_circle_meters(
     lon2: float,
 ) -> float:
     """Return the great-circle distance between two lat/lon points in meters."""
-    return float(_GREAT_CIRCLE(lat1, lon1, lat2, lon2))
+    y1 = math.radians(lat1)
+    y2 = math.radians(lat2)
+    h = (
+        math.sin((y2 - y1) / 2) ** 2
+        + math.cos(y1) * math.cos(y2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    # Clamp to guard `asin` against floating point overshoot.
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, h)))
+
+
+def great_circle_meters_array(
+    lat1: npt.ArrayLike,
+    lon1: npt.ArrayLike,
+    lat2: npt.ArrayLike,
+    lon2: npt.ArrayLike,
+) -> npt.NDArray[np.float64]:
+    """Return element-wise great-circle distances between lat/lon arrays in meters."""
+    y1 = np.radians(lat1)
+    y2 = np.radians(lat2)
+    h = (
+        np.sin((y2 - y1) / 2) ** 2
+        + np.cos(y1) * np.cos(y2) * np.sin(np.radians(np.subtract(lon2, lon1)) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(1.0, h)))
+
+
+def segment_lengths_meters(coords: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """Return the great-circle length of each segment of a `(lon, lat)` polyline.
+
+    Parameters
+    ----------
+    coords:
+        Array-like of shape `(n, 2)` holding `(lon, lat)` vertices.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape `(n - 1,)` with the length of every consecutive vertex
+        pair in meters.
+
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    lons = coords[:, 0]
+    lats = coords[:, 1]
+    return great_circle_meters_array(lats[:-1], lons[:-1], lats[1:], lons[1:])